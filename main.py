@@ -1,9 +1,13 @@
+import asyncio
+import functools
 import pandas as pd
-from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
 import logging
 from datetime import datetime
 import os
 from typing import Dict, List, Optional, Tuple
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill, Font, Alignment
 from openpyxl.utils import get_column_letter
 import re
@@ -18,31 +22,120 @@ logging.basicConfig(
     ]
 )
 
+# Precompiled patterns used while cleaning and parsing partner rows
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_SCORE_RE = re.compile(r'sortScore\s*:\s*(\d+\.?\d*)')
+_LOC_RE = re.compile(r'Locations:\s*(\d+)')
+
+# Punctuation and symbols kept by clean_text besides word characters and whitespace
+_KEEP = frozenset(".,;?!@-_+()/#")
+
+
+class _StripTable(dict):
+    """str.translate table deleting everything but word characters, whitespace and _KEEP, filled lazily per code point"""
+
+    def __missing__(self, code_point: int) -> Optional[int]:
+        char = chr(code_point)
+        value = code_point if char.isalnum() or char.isspace() or char in _KEEP else None
+        self[code_point] = value
+        return value
+
+
+_TRANS = _StripTable()
+
+
+def _class_xpath(tag: str, class_name: str) -> etree.XPath:
+    """Compile a descendant lookup for tags carrying class_name among their classes"""
+    return etree.XPath(
+        f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+    )
+
+
+# Row-level elements located in a single pass over each partner <tr>, keyed by (tag, class)
+_ROW_CLASS_FIELDS = {
+    ("span", "pl-results-row-no"): "number",
+    ("td", "sf-hidden"): "hidden",
+    ("a", "pl-results-partner-name"): "name",
+    ("span", "pl-results-partner-info"): "partner_info",
+    ("span", "pl-results-td-address-plocez__Mailing_Address__c"): "address",
+    ("span", "pl-results-td-contact-plocez__Contact__c"): "contact",
+    ("span", "pl-results-td-contact-plocez__Email__c"): "email",
+    ("span", "pl-results-td-contact-plocez__Phone__c"): "phone",
+    ("span", "pl-results-td-contact-PLP_Website__c"): "website",
+    ("span", "pl-results-td-account-Product_Specialization__c"): "specialization",
+}
+_ROW_FIELD_TAGS = ("span", "td", "a")
+# The partner type span is identified by its id rather than by class
+_PARTNER_TYPE_ID = "resultsPartnerType"
+
+# Precompiled XPath lookups used inside the elements found above
+_ROW_NO_XPATH = _class_xpath("td", "pl-results-td-row-no")
+_ROW_XPATHS = {
+    "list_items": _class_xpath("li", "list-group-item"),
+    "partner_count": _class_xpath("span", "pl-results-partner-count"),
+    "contact_address": _class_xpath("span", "pl-results-td-contact-plocez__Address__c"),
+    "value": _class_xpath("span", "pl-results-value"),
+    "link": etree.XPath(".//a[@href]"),
+}
+
+
+def _collect_row_elements(row: lxml_html.HtmlElement) -> Dict[str, lxml_html.HtmlElement]:
+    """Walk a partner row once and map each field name to its first matching element"""
+    found = {}
+    for element in row.iter(*_ROW_FIELD_TAGS):
+        for class_name in element.get("class", "").split():
+            field = _ROW_CLASS_FIELDS.get((element.tag, class_name))
+            if field is not None and field not in found:
+                found[field] = element
+        if element.tag == "span" and "partner_type" not in found and _PARTNER_TYPE_ID in element.get("id", ""):
+            found["partner_type"] = element
+    return found
+
+
+# Progress is logged once per this many parsed rows (and for the last row)
+_PROGRESS_LOG_EVERY = 500
+
+
+def _first(element: lxml_html.HtmlElement, key: str) -> Optional[lxml_html.HtmlElement]:
+    """Return the first descendant matched by the named row XPath, or None"""
+    matches = _ROW_XPATHS[key](element)
+    return matches[0] if matches else None
+
+
+def _text(element: lxml_html.HtmlElement, strip: bool = False) -> str:
+    """Concatenate the text of an element and its descendants"""
+    if strip:
+        return "".join(part.strip() for part in element.itertext())
+    return "".join(element.itertext())
+
 
 class PartnerScraper:
-    def __init__(self):
-        self.required_fields = {
-            "Number": str,
-            "Siemens Batch": str,
-            "Name": str,
-            "Partner Batch": str,
-            "Locations": str,
-            "Office address": str,
-            "Contact Name": str,
-            "Contact Email": str,
-            "Contact Telephone": str,
-            "Contact website": str,
-            "Proced Specialization": str
-        }
-
-    def clean_text(self, text: str) -> str:
-        """Clean and normalize text content"""
+    REQUIRED_FIELDS = (
+        "Number",
+        "Siemens Batch",
+        "Name",
+        "Partner Batch",
+        "Locations",
+        "Office address",
+        "Contact Name",
+        "Contact Email",
+        "Contact Telephone",
+        "Contact website",
+        "Proced Specialization"
+    )
+    # Record returned for rows that fail to parse; tuples are immutable so it can be shared
+    EMPTY_RECORD = ("",) * len(REQUIRED_FIELDS)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def clean_text(text: str) -> str:
+        """Clean and normalize text content (memoized, scraped values repeat across partners)"""
         if not text:
             return ""
         # Remove extra whitespace and normalize newlines
-        text = re.sub(r'\s+', ' ', text.strip())
+        text = " ".join(text.split())
         # Remove special characters but keep basic punctuation and common symbols
-        text = re.sub(r'[^\w\s.,;?!@\-_+()/#]', '', text)
+        text = text.translate(_TRANS)
         return text
 
     def validate_email(self, email: str) -> str:
@@ -50,46 +143,54 @@ class PartnerScraper:
         if not email:
             return ""
         email = email.lower().strip()
-        # Basic email validation
-        if re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
-            return email
+        # Cheap structural check first, only run the regex on plausible addresses
+        if "@" in email and "." in email.rsplit("@", 1)[-1]:
+            # Basic email validation
+            if _EMAIL_RE.match(email):
+                return email
         logging.warning(f"Invalid email format found: {email}")
         return ""
 
-    def extract_address_components(self, address_td: BeautifulSoup) -> Tuple[str, str, str, str]:
+    def extract_address_components(self, address_td: lxml_html.HtmlElement) -> Tuple[str, str, str, str]:
         """
         Extract address components from the address TD element
         Returns: Tuple of (street, city, state/region, country)
         """
-        if not address_td:
+        if address_td is None:
             return ("", "", "", "")
 
         try:
             # Find the specific address span within the correct column
-            address_span = address_td.find("span", class_="pl-results-td-contact-plocez__Address__c")
-            if not address_span:
+            address_span = _first(address_td, "contact_address")
+            if address_span is None:
                 return ("", "", "", "")
 
-            # Get all text elements, removing empty strings and extra whitespace
-            address_parts = [part.strip() for part in address_span.stripped_strings if part.strip()]
-
             # Initialize components
             street = city = state = country = ""
 
-            if len(address_parts) >= 1:
-                street = address_parts[0]
-            if len(address_parts) >= 2:
-                city = address_parts[1]
-            if len(address_parts) >= 3:
-                # Check if the third part contains both state and country
-                state_country = address_parts[2].split(',')
-                if len(state_country) == 2:
-                    state = state_country[0].strip()
-                    country = state_country[1].strip()
+            # Assign the non-empty text elements in order, stopping after the fourth
+            index = 0
+            for part in address_span.itertext():
+                part = part.strip()
+                if not part:
+                    continue
+                if index == 0:
+                    street = part
+                elif index == 1:
+                    city = part
+                elif index == 2:
+                    # Check if the third part contains both state and country
+                    state_country = part.split(',')
+                    if len(state_country) == 2:
+                        state = state_country[0].strip()
+                        country = state_country[1].strip()
+                    else:
+                        state = part
                 else:
-                    state = address_parts[2]
-            if len(address_parts) >= 4 and not country:
-                country = address_parts[3]
+                    if not country:
+                        country = part
+                    break
+                index += 1
 
             return (
                 self.clean_text(street),
@@ -101,23 +202,23 @@ class PartnerScraper:
             logging.error(f"Error extracting address components: {str(e)}")
             return ("", "", "", "")
 
-    def parse_partner_row(self, html_snippet: str) -> Dict:
-        """Parse a single partner row with enhanced error handling and validation"""
+    def parse_partner_row(self, row: lxml_html.HtmlElement) -> Tuple[str, ...]:
+        """Parse a single partner row (<tr> element) with enhanced error handling and validation"""
         try:
-            soup = BeautifulSoup(html_snippet, "html.parser")
+            elements = _collect_row_elements(row)
 
             # Number
             number_text = ""
-            number_tag = soup.find("span", class_="pl-results-row-no")
-            number_text = self.clean_text(number_tag.get_text()) if number_tag else ""
+            number_tag = elements.get("number")
+            number_text = self.clean_text(_text(number_tag)) if number_tag is not None else ""
 
             # Siemens Batch
             siemens_batch = ""
-            hidden_td = soup.find("td", class_="sf-hidden")
-            if hidden_td:
-                hidden_text = hidden_td.get_text(strip=True)
+            hidden_td = elements.get("hidden")
+            if hidden_td is not None:
+                hidden_text = _text(hidden_td, strip=True)
                 try:
-                    score_match = re.search(r'sortScore\s*:\s*(\d+\.?\d*)', hidden_text)
+                    score_match = _SCORE_RE.search(hidden_text)
                     if score_match:
                         siemens_batch = score_match.group(1)
                 except Exception as e:
@@ -125,175 +226,212 @@ class PartnerScraper:
 
             # Partner Name
             partner_name = ""
-            name_tag = soup.find("a", class_="pl-results-partner-name")
-            partner_name = self.clean_text(name_tag.get_text()) if name_tag else ""
+            name_tag = elements.get("name")
+            partner_name = self.clean_text(_text(name_tag)) if name_tag is not None else ""
 
             # Partner Batch with enhanced parsing
             partner_batch = ""
-            partner_type_span = soup.find("span", id=lambda x: x and "resultsPartnerType" in x)
-            if partner_type_span:
-                batch_items = partner_type_span.find_all("li", class_="list-group-item")
-                partner_batch = ", ".join(self.clean_text(item.get_text()) for item in batch_items)
+            partner_type_span = elements.get("partner_type")
+            if partner_type_span is not None:
+                batch_items = _ROW_XPATHS["list_items"](partner_type_span)
+                partner_batch = ", ".join(self.clean_text(_text(item)) for item in batch_items)
 
             # Locations with number validation
             locations_text = ""
-            partner_info_span = soup.find("span", class_="pl-results-partner-info")
-            if partner_info_span:
-                count_span = partner_info_span.find("span", class_="pl-results-partner-count")
-                if count_span:
-                    text = count_span.get_text(strip=True)
-                    locations_match = re.search(r'Locations:\s*(\d+)', text)
+            partner_info_span = elements.get("partner_info")
+            if partner_info_span is not None:
+                count_span = _first(partner_info_span, "partner_count")
+                if count_span is not None:
+                    text = _text(count_span, strip=True)
+                    locations_match = _LOC_RE.search(text)
                     if locations_match:
                         locations_text = locations_match.group(1)
 
             # Office address with formatting
             office_address = ""
             # Find the specific address column using proper selector
-            #address_td = soup.find("td", class_="pl-results-td-address")
-            address_span = soup.find("span", class_="pl-results-td-address-plocez__Mailing_Address__c")
-            if address_span:
-                address_detail = address_span.find("span", class_="pl-results-value")
-                if address_detail:
-                    office_address = self.clean_text(address_span.get_text())
+            address_span = elements.get("address")
+            if address_span is not None:
+                address_detail = _first(address_span, "value")
+                if address_detail is not None:
+                    office_address = self.clean_text(_text(address_span))
 
             # Contact information with validation
             contact_name = ""
-            contact_name_span = soup.find("span", class_="pl-results-td-contact-plocez__Contact__c")
-            if contact_name_span:
-                    contact_detail = contact_name_span.find("span", class_="pl-results-value")
-                    if contact_detail:
-                        contact_name = self.clean_text(contact_detail.get_text())
+            contact_name_span = elements.get("contact")
+            if contact_name_span is not None:
+                    contact_detail = _first(contact_name_span, "value")
+                    if contact_detail is not None:
+                        contact_name = self.clean_text(_text(contact_detail))
 
             # Email with validation
             contact_email = ""
-            email_span = soup.find("span", class_="pl-results-td-contact-plocez__Email__c")
-            if email_span:
-                mailto = email_span.find("a", href=True)
-                if mailto:
-                    contact_email = self.validate_email(mailto.get_text())
+            email_span = elements.get("email")
+            if email_span is not None:
+                mailto = _first(email_span, "link")
+                if mailto is not None:
+                    contact_email = self.validate_email(_text(mailto))
 
             # Phone with validation
             contact_phone = ""
-            phone_span = soup.find("span", class_="pl-results-td-contact-plocez__Phone__c")
-            if phone_span:
-                phone_link = phone_span.find("a", href=True)
-                if phone_link:
-                    contact_phone = self.clean_text(phone_link.get_text())
+            phone_span = elements.get("phone")
+            if phone_span is not None:
+                phone_link = _first(phone_span, "link")
+                if phone_link is not None:
+                    contact_phone = self.clean_text(_text(phone_link))
 
             # Website with validation
             contact_website = ""
-            website_span = soup.find("span", class_="pl-results-td-contact-PLP_Website__c")
-            if website_span:
-                web_link = website_span.find("a", href=True)
-                if web_link:
+            website_span = elements.get("website")
+            if website_span is not None:
+                web_link = _first(website_span, "link")
+                if web_link is not None:
                     href = web_link.get('href', '')
                     contact_website = href if href.startswith(('http://', 'https://')) else ''
 
             # Specializations with deduplication
             specializations = set()
-            spec_container = soup.find("span", class_="pl-results-td-account-Product_Specialization__c")
-            if spec_container:
-                for li in spec_container.find_all("li", class_="list-group-item"):
-                    spec = self.clean_text(li.get_text())
+            spec_container = elements.get("specialization")
+            if spec_container is not None:
+                for li in _ROW_XPATHS["list_items"](spec_container):
+                    spec = self.clean_text(_text(li))
                     if spec:
                         specializations.add(spec)
             proced_specialization = ", ".join(sorted(specializations))
 
-            return {
-                "Number": number_text,
-                "Siemens Batch": siemens_batch,
-                "Name": partner_name,
-                "Partner Batch": partner_batch,
-                "Locations": locations_text,
-                "Office address": office_address,
-                "Contact Name": contact_name,
-                "Contact Email": contact_email,
-                "Contact Telephone": contact_phone,
-                "Contact website": contact_website,
-                "Proced Specialization": proced_specialization
-            }
+            # Positional record in REQUIRED_FIELDS order
+            return (
+                number_text,
+                siemens_batch,
+                partner_name,
+                partner_batch,
+                locations_text,
+                office_address,
+                contact_name,
+                contact_email,
+                contact_phone,
+                contact_website,
+                proced_specialization
+            )
 
         except Exception as e:
             logging.error(f"Error parsing partner row: {str(e)}")
-            return {field: "" for field in self.required_fields}
+            return self.EMPTY_RECORD
 
-    def parse_all_partners(self, html_content: str) -> List[Dict]:
-        """Parse all partner rows from the HTML content"""
+    def parse_all_partners(self, html_content: str) -> Dict[str, List[str]]:
+        """Parse all partner rows from the HTML content into one list per required field"""
         try:
-            soup = BeautifulSoup(html_content, "html.parser")
-            partner_rows = soup.find_all("td", class_="pl-results-td-row-no")
+            document = lxml_html.fromstring(html_content)
+            partner_rows = _ROW_NO_XPATH(document)
 
-            results = []
-            #for idx, row in enumerate(partner_rows, 1):
+            parent_trs = []
             for idx, row_num_td in enumerate(partner_rows, 1):
                 try:
                     # 2) Each "row_num_td" is a <td>.  The <tr> is its parent:
-                    parent_tr = row_num_td.find_parent("tr")
-
-                    # 3) Convert that <tr> to a string and parse it:
-                    row_html = str(parent_tr)
-                    row_data = self.parse_partner_row(row_html)
-
-                    results.append(row_data)
-                    logging.info(
-                        f"Processed partner {idx}/{len(partner_rows)}: {row_data.get('Name', '(no name)')}"
-                    )
-                    #row_html = str(row)
-                    #row_data = self.parse_partner_row(row_html)
-                    #results.append(row_data)
-                    #logging.info(f"Processed partner {idx}/{len(partner_rows)}: {row_data['Name']}")
+                    parent_trs.append(next(row_num_td.iterancestors("tr")))
                 except Exception as e:
                     logging.error(f"Error processing row {idx}: {str(e)}")
 
-            return results
+            # 3) Parse the <tr> elements directly from the already built tree
+            name_index = self.REQUIRED_FIELDS.index("Name")
+            total = len(parent_trs)
+            results = []
+            for idx, parent_tr in enumerate(parent_trs, 1):
+                row_data = self.parse_partner_row(parent_tr)
+                results.append(row_data)
+                if idx % _PROGRESS_LOG_EVERY == 0 or idx == total:
+                    logging.info(f"Processed partner {idx}/{total}: {row_data[name_index]}")
+
+            if not results:
+                return {}
+            # Transpose the row records into columns for DataFrame construction
+            return {field: list(column) for field, column in zip(self.REQUIRED_FIELDS, zip(*results))}
         except Exception as e:
             logging.error(f"Error parsing HTML content: {str(e)}")
-            return []
-
-    def format_excel(self, workbook, df: pd.DataFrame) -> None:
-        """Apply formatting to Excel workbook"""
-        worksheet = workbook.active
+            return {}
+
+    def export_excel(self, df: pd.DataFrame, output_file: str) -> None:
+        """Stream partner data into a formatted write-only Excel workbook"""
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet("Sheet1")
+
+        # Adjust column widths, measuring the longest value of every column in one pass
+        # (write-only sheets need the widths before any row is appended)
+        value_lengths = [
+            max((len(str(value)) for value in df.iloc[:, col]), default=0) for col in range(len(df.columns))
+        ]
+        for col in range(1, len(df.columns) + 1):
+            column_letter = get_column_letter(col)
+            max_length = max(len(str(df.columns[col - 1])), value_lengths[col - 1])
+            adjusted_width = min(max_length + 2, 50)  # Cap width at 50
+            worksheet.column_dimensions[column_letter].width = adjusted_width
 
         # Format header
         header_fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
         header_font = Font(color="FFFFFF", bold=True)
+        header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
 
-        for col in range(1, len(df.columns) + 1):
-            cell = worksheet.cell(row=1, column=col)
+        header_cells = []
+        for column_name in df.columns:
+            cell = WriteOnlyCell(worksheet, value=column_name)
             cell.fill = header_fill
             cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-
-        # Adjust column widths
-        for col in range(1, len(df.columns) + 1):
-            column_letter = get_column_letter(col)
-            max_length = max(
-                len(str(df.columns[col - 1])),
-                df.iloc[:, col - 1].astype(str).map(len).max()
-            )
-            adjusted_width = min(max_length + 2, 50)  # Cap width at 50
-            worksheet.column_dimensions[column_letter].width = adjusted_width
-
-        # Format data cells
-        for row in range(2, len(df) + 2):
-            for col in range(1, len(df.columns) + 1):
-                cell = worksheet.cell(row=row, column=col)
-                cell.alignment = Alignment(vertical='center', wrap_text=True)
-
-
-def main():
+            cell.alignment = header_alignment
+            header_cells.append(cell)
+        worksheet.append(header_cells)
+
+        # Format data cells, sharing a single alignment object
+        data_alignment = Alignment(vertical='center', wrap_text=True)
+        for values in df.itertuples(index=False, name=None):
+            row_cells = []
+            for value in values:
+                cell = WriteOnlyCell(worksheet, value=value)
+                cell.alignment = data_alignment
+                row_cells.append(cell)
+            worksheet.append(row_cells)
+
+        workbook.save(output_file)
+
+
+def _read_html(input_file: str) -> str:
+    """Read the exported partners HTML page"""
+    with open(input_file, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _write_summary(df: pd.DataFrame, summary_file: str) -> None:
+    """Generate summary statistics and save them as text"""
+    counts = df.agg({
+        "Partner Batch": "nunique",
+        "Contact Email": lambda column: column.notna().sum(),
+        "Contact Telephone": lambda column: column.notna().sum()
+    })
+    specializations = df["Proced Specialization"].dropna().str.split(",").explode().str.strip()
+    summary = {
+        "Total Partners": len(df),
+        "Unique Batches": counts["Partner Batch"],
+        "Partners with Email": counts["Contact Email"],
+        "Partners with Phone": counts["Contact Telephone"],
+        "Unique Specializations": specializations.nunique()
+    }
+
+    with open(summary_file, "w") as f:
+        for key, value in summary.items():
+            f.write(f"{key}: {value}\n")
+
+
+async def main():
     # Input and output file paths
     input_file = "Partners_Mendix.htm"
     output_dir = "output"
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
-
     try:
         # Read HTML content
-        with open(input_file, "r", encoding="utf-8") as f:
-            html_content = f.read()
+        html_content = await asyncio.to_thread(_read_html, input_file)
+
+        # Create output directory if it doesn't exist
+        os.makedirs(output_dir, exist_ok=True)
 
         # Initialize scraper and process data
         scraper = PartnerScraper()
@@ -306,27 +444,13 @@ def main():
         # Convert to DataFrame
         df = pd.DataFrame(partner_data)
 
-        # Save to Excel with formatting
+        # Save the Excel export and the summary concurrently
         output_file = os.path.join(output_dir, f"partner_data_{timestamp}.xlsx")
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False)
-            scraper.format_excel(writer.book, df)
-
-        # Generate summary
-        summary = {
-            "Total Partners": len(df),
-            "Unique Batches": df["Partner Batch"].nunique(),
-            "Partners with Email": df["Contact Email"].notna().sum(),
-            "Partners with Phone": df["Contact Telephone"].notna().sum(),
-            "Unique Specializations": len(set(s.strip() for specs in df["Proced Specialization"].dropna()
-                                              for s in specs.split(",")))
-        }
-
-        # Save summary
         summary_file = os.path.join(output_dir, f"summary_{timestamp}.txt")
-        with open(summary_file, "w") as f:
-            for key, value in summary.items():
-                f.write(f"{key}: {value}\n")
+        await asyncio.gather(
+            asyncio.to_thread(scraper.export_excel, df, output_file),
+            asyncio.to_thread(_write_summary, df, summary_file)
+        )
 
         logging.info(f"Successfully exported {len(df)} partners to {output_file}")
 
@@ -336,4 +460,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file